@@ -4,6 +4,9 @@ from typing import List, Union
 
 class Namespace(argparse.Namespace):
 
+    # NOTE dests given on command line, as a slot so it's excluded from vars() / == / repr
+    __slots__ = ('_cli_dests',)
+
     # NOTE syntax sugar
     def __getitem__(self, key: Union[argparse.Action, List[argparse.Action]]):
         if isinstance(key, list):
@@ -1,7 +1,13 @@
 import argparse
+import copy
+import functools
+import os
+import shlex
+from typing import List, Mapping, Sequence, Tuple
 
 from .formatters import ArgumentDefaultsHelpFormatter
 from .namespace import Namespace
+from .sources import load_config_file
 
 
 class ArgumentParser(argparse.ArgumentParser):
@@ -20,6 +26,9 @@ class ArgumentParser(argparse.ArgumentParser):
             conflict_handler='error',
             add_help=True,
             allow_abbrev=True,
+            default_files: Sequence[str] = (),
+            env_prefix: str = None,
+            default_dict: Mapping[str, object] = None,
         ):
         super().__init__(
             prog=prog,
@@ -35,15 +44,316 @@ class ArgumentParser(argparse.ArgumentParser):
             add_help=add_help,
             allow_abbrev=allow_abbrev,
         )
+        # layered defaults, precedence: CLI > env > files (latter first) > default_dict > default
+        self.default_files = list(default_files)
+        self.env_prefix = env_prefix
+        self.default_dict = dict(default_dict or {})
+        self._delta_parser = None
+        self._delta_parser_key = None
+        self._cli_dests = None
 
     def parse_known_args(self, args=None, namespace=None):
         if namespace is None:
             namespace = Namespace()
 
-        return super().parse_known_args(args, namespace)
+        # NOTE layered values are applied after parsing to the dests not given on command line,
+        # so only the winners are converted. The placeholder stops argparse from filling
+        # (and converting) the argument default, and lets append / count start from empty.
+        layered = self._collect_layered_defaults(namespace)
+        for dest in layered:
+            setattr(namespace, dest, None)
+
+        # NOTE layered values satisfy required arguments / groups,
+        # argparse only counts CLI so relax them during this parse.
+        relaxed = [action for action, _ in layered.values() if action.required] + [
+            group
+            for group in self._mutually_exclusive_groups
+            if group.required and any(action.dest in layered for action in group._group_actions)
+        ]
+        for item in relaxed:
+            item.required = False
+        outer_cli_dests, self._cli_dests = self._cli_dests, set()
+        try:
+            namespace, extras = super().parse_known_args(args, namespace)
+        finally:
+            for item in relaxed:
+                item.required = True
+            cli_dests, self._cli_dests = self._cli_dests, outer_cli_dests
+
+        if isinstance(namespace, Namespace):
+            namespace._cli_dests = getattr(namespace, '_cli_dests', frozenset()) | cli_dests
+
+        for dest, (action, value) in layered.items():
+            if dest not in cli_dests:
+                setattr(namespace, dest, self._convert_layered_default(action, value))
+        return namespace, extras
+
+    def _get_values(self, action, arg_strings):
+        # NOTE absent positionals with nargs='?'/'*' are also taken, but without strings
+        if self._cli_dests is not None and (action.option_strings or arg_strings):
+            self._cli_dests.add(action.dest)
+        return super()._get_values(action, arg_strings)
+
+    def reparse(self, base_namespace, delta_argv) -> Tuple[Namespace, List[str]]:
+        # apply option edits onto a copy of a parsed namespace,
+        # untouched values are reused as is without re-running types / defaults.
+        if self._subparsers is not None:
+            raise ValueError("reparse doesn't support parsers with subcommands")
+        if isinstance(base_namespace, Namespace):
+            namespace = copy.copy(base_namespace)
+        else:
+            namespace = Namespace(**vars(base_namespace))
+        base_cli_dests = getattr(base_namespace, '_cli_dests', None)
+        if base_cli_dests is None:
+            # not parsed by flexparse, guess given dests by non-default values
+            base_cli_dests = frozenset(
+                action.dest
+                for action in self._actions
+                if action.dest is not argparse.SUPPRESS
+                and hasattr(base_namespace, action.dest)
+                and _is_changed(action.default, getattr(base_namespace, action.dest))
+            )
+
+        namespace._cli_dests = frozenset()
+        namespace, extras = self._get_delta_parser().parse_known_args(delta_argv, namespace)
+        if extras:
+            self.error(f"unrecognized arguments: {' '.join(extras)}")
+        delta_cli_dests = namespace._cli_dests
+        namespace._cli_dests = base_cli_dests | delta_cli_dests
+
+        changed = []
+        for action in self._actions:
+            dest = action.dest
+            if dest is argparse.SUPPRESS or dest in changed:
+                continue
+            if _is_changed(getattr(base_namespace, dest, None), getattr(namespace, dest, None)):
+                changed.append(dest)
+
+        self._check_affected_groups(base_cli_dests, delta_cli_dests)
+        return namespace, changed
+
+    def _get_delta_parser(self):
+        # NOTE option-only copy of this parser, without required checks since
+        # the base namespace has already satisfied them.
+        key = tuple(self._actions)
+        if self._delta_parser_key == key:
+            return self._delta_parser
+
+        parser = ArgumentParser(
+            prog=self.prog,
+            prefix_chars=self.prefix_chars,
+            fromfile_prefix_chars=self.fromfile_prefix_chars,
+            add_help=False,
+            allow_abbrev=self.allow_abbrev,
+        )
+        parser.error = self.error
+        copied = {}
+        for action in self._actions:
+            if (
+                not action.option_strings
+                or action.dest is argparse.SUPPRESS
+                or isinstance(action, (argparse._HelpAction, argparse._VersionAction))
+            ):
+                continue
+            copied[action] = copy.copy(action)
+            copied[action].required = False
+            # or argparse would convert string defaults of untouched actions again
+            copied[action].default = None
+
+        grouped = set()
+        for group in self._mutually_exclusive_groups:
+            delta_group = parser.add_mutually_exclusive_group()
+            for action in group._group_actions:
+                if action in copied:
+                    delta_group._add_action(copied[action])
+                    grouped.add(action)
+        for action, delta_action in copied.items():
+            if action not in grouped:
+                parser._add_action(delta_action)
+
+        self._delta_parser, self._delta_parser_key = parser, key
+        return parser
+
+    def _check_affected_groups(self, base_cli_dests, delta_cli_dests):
+        # delta only adds values, so only conflicts with the base's CLI values need re-check
+        for group in self._mutually_exclusive_groups:
+            given = [action for action in group._group_actions if action.dest in delta_cli_dests]
+            if not given:
+                continue
+            for action in group._group_actions:
+                if action.dest in base_cli_dests and action.dest not in delta_cli_dests:
+                    self.error(
+                        f"argument {_format_action_name(given[0])}: "
+                        f"not allowed with argument {_format_action_name(action)}",
+                    )
+
+    def add_subparsers(self, **kwargs):
+        # subcommands share the layered sources
+        kwargs.setdefault('parser_class', functools.partial(
+            type(self),
+            default_files=self.default_files,
+            env_prefix=self.env_prefix,
+            default_dict=self.default_dict,
+        ))
+        return super().add_subparsers(**kwargs)
+
+    def parse_known_intermixed_args(self, args=None, namespace=None):
+        # NOTE the 2nd pass sees positionals filled by the 1st, so can't tell layered ones from CLI
+        if self._has_layered_sources():
+            raise ValueError("intermixed parsing doesn't support layered default sources")
+        return super().parse_known_intermixed_args(args, namespace)
+
+    def _has_layered_sources(self) -> bool:
+        return bool(self.default_files or self.env_prefix is not None or self.default_dict)
+
+    def _collect_layered_defaults(self, namespace):
+        if not self._has_layered_sources():
+            return {}
+
+        file_defaults = {}
+        for path in self.default_files:
+            file_defaults.update(
+                (key.replace('-', '_'), value)
+                for key, value in load_config_file(path).items()
+            )
+
+        layered = {}
+        for action in self._actions:
+            dest = action.dest
+            if (
+                dest is argparse.SUPPRESS
+                or isinstance(action, _UNLAYERED_ACTIONS)
+                or dest in layered
+                or hasattr(namespace, dest)
+            ):
+                continue
+            env_key = f"{self.env_prefix}{dest.upper()}" if self.env_prefix is not None else None
+            if env_key is not None and env_key in os.environ:
+                value = os.environ[env_key]
+            elif dest in file_defaults:
+                # copy since file content is cached
+                value = copy.deepcopy(file_defaults[dest])
+            elif dest in self.default_dict:
+                value = self.default_dict[dest]
+            else:
+                continue
+            layered[dest] = (action, value)
+        return layered
+
+    def _convert_layered_default(self, action, value):
+        try:
+            if isinstance(action, argparse._CountAction):
+                try:
+                    return int(value)
+                except (TypeError, ValueError):
+                    raise argparse.ArgumentError(action, f"invalid count value: {value!r}")
+            if isinstance(action, _BOOL_ACTIONS):
+                return _to_bool(action, value)
+            if isinstance(action, argparse._StoreConstAction):
+                # whether the flag is given
+                return action.const if _to_bool(action, value) else action.default
+            if isinstance(action, _EXTEND_ACTIONS):
+                return [
+                    self._convert_layered_scalar(action, item)
+                    for item in _split_layered_value(value)
+                ]
+            if isinstance(action, argparse._AppendAction):
+                return self._convert_layered_appends(action, _split_layered_value(value))
+            return self._convert_layered_item(action, value)
+        except argparse.ArgumentError as err:
+            self.error(str(err))
+
+    def _convert_layered_appends(self, action, items):
+        if not _takes_multiple(action):
+            return [self._convert_layered_scalar(action, item) for item in items]
+        # one list per append, file values may be grouped already
+        if items and all(isinstance(item, (list, tuple)) for item in items):
+            groups = items
+        elif isinstance(action.nargs, int):
+            groups = [items[i:i + action.nargs] for i in range(0, len(items), action.nargs)]
+        else:
+            groups = [items]
+        return [self._convert_layered_group(action, list(group)) for group in groups]
+
+    def _convert_layered_item(self, action, value):
+        if _takes_multiple(action):
+            return self._convert_layered_group(action, _split_layered_value(value))
+        return self._convert_layered_scalar(action, value)
+
+    def _convert_layered_group(self, action, items):
+        if isinstance(action.nargs, int) and len(items) != action.nargs:
+            raise argparse.ArgumentError(action, f"expected {action.nargs} arguments")
+        if action.nargs == argparse.ONE_OR_MORE and not items:
+            raise argparse.ArgumentError(action, "expected at least one argument")
+        return [self._convert_layered_scalar(action, item) for item in items]
+
+    def _convert_layered_scalar(self, action, value):
+        # NOTE file values may be already typed, still run `type` on them for validation
+        if isinstance(value, (str, int, float)):
+            value = self._get_value(action, value)
+        self._check_value(action, value)
+        return value
 
     def add_argument_group(self, title=None, description=None, actions=(), **kwargs):
         group = super().add_argument_group(title, description=description, **kwargs)
         for action in actions:
             group._add_action(action)
         return group
+
+
+def _is_changed(old, new) -> bool:
+    if old is new:
+        return False
+    try:
+        return bool(old != new)
+    except Exception:  # e.g. incomparable or ambiguous truth value
+        return True
+
+
+def _format_action_name(action):
+    return '/'.join(action.option_strings) or action.metavar or action.dest
+
+
+def _to_bool(action, value) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        if value.lower() in _TRUTHY_STRINGS:
+            return True
+        if value.lower() in _FALSY_STRINGS:
+            return False
+    raise argparse.ArgumentError(
+        action,
+        f"invalid boolean value: {value!r} "
+        f"(choose from {', '.join(_TRUTHY_STRINGS + _FALSY_STRINGS)})",
+    )
+
+
+def _takes_multiple(action) -> bool:
+    return action.nargs in _MULTIPLE_NARGS or isinstance(action.nargs, int)
+
+
+def _split_layered_value(value):
+    # env strings are split like a shell command line, file values may already be lists
+    if isinstance(value, str):
+        return shlex.split(value)
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+_BOOL_ACTIONS = tuple(
+    action_cls
+    for action_cls in (
+        argparse._StoreTrueAction,
+        argparse._StoreFalseAction,
+        getattr(argparse, 'BooleanOptionalAction', None),  # python >= 3.9
+    )
+    if action_cls is not None
+)
+_MULTIPLE_NARGS = (argparse.ZERO_OR_MORE, argparse.ONE_OR_MORE)
+# python >= 3.8
+_EXTEND_ACTIONS = (argparse._ExtendAction,) if hasattr(argparse, '_ExtendAction') else ()
+_UNLAYERED_ACTIONS = (argparse._AppendConstAction, argparse._HelpAction, argparse._VersionAction)
+_TRUTHY_STRINGS = ('1', 'true', 'yes', 'on')
+_FALSY_STRINGS = ('0', 'false', 'no', 'off')
@@ -0,0 +1,50 @@
+import json
+import os
+from typing import Dict, Tuple
+
+try:
+    import tomllib as _toml
+except ImportError:  # python < 3.11
+    try:
+        import tomli as _toml
+    except ImportError:
+        _toml = None
+
+
+# NOTE path -> (mtime_ns, content), so re-parsing in the same process won't re-read files
+_FILE_CACHE: Dict[str, Tuple[int, dict]] = {}
+
+
+def load_config_file(path) -> dict:
+    path = os.fspath(path)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+
+    cached = _FILE_CACHE.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    content = _read_config_file(path)
+    if not isinstance(content, dict):
+        raise ValueError(f"config file {path!r} should contain a mapping")
+    _FILE_CACHE[path] = (mtime, content)
+    return content
+
+
+def _read_config_file(path: str):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.json':
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    if ext == '.toml':
+        if _toml is None:
+            raise ImportError("reading .toml config requires python >= 3.11 or `tomli`")
+        with open(path, 'rb') as f:
+            return _toml.load(f)
+    raise ValueError(f"unsupported config file format: {path!r} (choose from .json, .toml)")
+
+
+def clear_cache():
+    _FILE_CACHE.clear()
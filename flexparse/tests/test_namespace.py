@@ -1,3 +1,5 @@
+import copy
+
 from ..namespace import Namespace
 
 
@@ -17,3 +19,12 @@ def test_getitem():
 
     assert namespace[apple_arg] == 'Apple'
     assert namespace[[banana_arg, apple_arg]] == ['Banana', 'Apple']
+
+
+def test_cli_dests_excluded_from_vars():
+    namespace = Namespace(apple='Apple')
+    namespace._cli_dests = frozenset({'apple'})
+
+    assert vars(namespace) == {'apple': 'Apple'}
+    assert namespace == Namespace(apple='Apple')
+    assert copy.copy(namespace)._cli_dests == {'apple'}
@@ -1,8 +1,10 @@
 import argparse
+import json
 import pytest
 from unittest.mock import patch
 
 from ..parser import ArgumentParser
+from ..types import IntRange
 
 
 @pytest.mark.parametrize(
@@ -24,3 +26,328 @@ def test_help_formatter(arg):
     with patch('sys.argv', arg.split()), pytest.raises(SystemExit) as exc_info:
         parser.parse_args()
     assert exc_info.value.code == 0
+
+
+class TestLayeredDefaults:
+
+    @pytest.fixture
+    def config_path(self, tmp_path):
+        path = tmp_path / 'config.json'
+        path.write_text(json.dumps({'lr': '0.1', 'epochs': 5, 'batch-size': 16, 'name': 'file'}))
+        return path
+
+    @pytest.fixture
+    def parser(self, config_path):
+        parser = ArgumentParser(
+            default_files=[config_path, config_path.with_name('missing.json')],
+            env_prefix='TEST_',
+            default_dict={'lr': 1.0, 'epochs': 1, 'name': 'dict', 'verbose': False},
+        )
+        parser.add_argument('--lr', type=float, default=10.)
+        parser.add_argument('--epochs', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument('--name', default='default')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--verbose', action='store_true')
+        return parser
+
+    def test_precedence(self, parser):
+        with patch.dict('os.environ', {'TEST_EPOCHS': '7', 'TEST_VERBOSE': 'true'}):
+            args = parser.parse_args(['--name', 'cli'])
+        assert args.lr == 0.1  # file, converted
+        assert args.epochs == 7  # env
+        assert args.batch_size == 16  # file, normalized key
+        assert args.name == 'cli'  # CLI
+        assert args.seed == 0  # default
+        assert args.verbose is True
+
+    @pytest.mark.parametrize('env_value, expected', [
+        ('true', True),
+        ('On', True),
+        ('1', True),
+        ('false', False),
+        ('no', False),
+        ('0', False),
+    ])
+    @pytest.mark.parametrize('flag_action', [
+        'store_true',
+        'store_false',
+        pytest.param(
+            getattr(argparse, 'BooleanOptionalAction', None),
+            marks=pytest.mark.skipif(
+                not hasattr(argparse, 'BooleanOptionalAction'),
+                reason='python >= 3.9',
+            ),
+            id='boolean_optional',
+        ),
+    ])
+    def test_flag_env(self, flag_action, env_value, expected):
+        parser = ArgumentParser(env_prefix='TEST_')
+        parser.add_argument('--cache', action=flag_action)
+        with patch.dict('os.environ', {'TEST_CACHE': env_value}):
+            assert parser.parse_args([]).cache is expected
+
+    def test_dict(self):
+        parser = ArgumentParser(default_dict={'x': '3'})
+        parser.add_argument('--x', type=int, default=0)
+        assert parser.parse_args([]).x == 3
+
+    def test_required(self):
+        parser = ArgumentParser(default_dict={'seed': '1', 'x': '2', 'foo': 'a'})
+        parser.add_argument('x', type=int)
+        parser.add_argument('--seed', type=int, required=True)
+        group = parser.add_mutually_exclusive_group(required=True)
+        group.add_argument('--foo')
+        group.add_argument('--boo')
+        args = parser.parse_args([])
+        assert (args.x, args.seed, args.foo) == (2, 1, 'a')
+        assert parser.parse_args(['3', '--seed', '4']).seed == 4
+        assert parser._actions[2].required and group.required
+
+    def test_required_missing(self):
+        parser = ArgumentParser(default_dict={'x': 1})
+        parser.add_argument('--x', type=int, required=True)
+        parser.add_argument('--y', type=int, required=True)
+        with pytest.raises(SystemExit):
+            parser.parse_args([])
+
+    @pytest.mark.parametrize('argv, expected', [
+        pytest.param([], 8, id='layered'),
+        pytest.param(['--n', '2'], 4, id='cli'),
+        pytest.param(['--n', '4'], 8, id='cli_same_as_layered'),
+    ])
+    def test_not_idempotent_type(self, argv, expected):
+        parser = ArgumentParser(default_dict={'n': 4})
+        parser.add_argument('--n', type=lambda s: int(s) * 2)
+        assert parser.parse_args(argv).n == expected
+
+    def test_subparsers(self):
+        parser = ArgumentParser(env_prefix='TEST_', default_dict={'j': '2'})
+        parser.add_argument('--j', type=int)
+        subparsers = parser.add_subparsers(dest='command')
+        subparsers.add_parser('train').add_argument('--k', type=int)
+        with patch.dict('os.environ', {'TEST_K': '1'}):
+            args = parser.parse_args(['train'])
+        assert (args.command, args.j, args.k) == ('train', 2, 1)
+
+    def test_intermixed(self):
+        parser = ArgumentParser(default_dict={'x': 1})
+        parser.add_argument('x', type=int)
+        with pytest.raises(ValueError):
+            parser.parse_intermixed_args([])
+
+        parser = ArgumentParser()
+        parser.add_argument('x', type=int)
+        assert parser.parse_intermixed_args(['1']).x == 1
+
+    def test_only_convert_winners(self, config_path):
+        calls = []
+
+        def type_(s):
+            calls.append(s)
+            return s
+
+        parser = ArgumentParser(default_files=[config_path], env_prefix='TEST_')
+        parser.add_argument('--name', type=type_)
+        parser.add_argument('--tag', type=type_, action='append')
+        with patch.dict('os.environ', {'TEST_NAME': 'env', 'TEST_TAG': 'env'}):
+            args = parser.parse_args(['--name', 'cli', '--tag', 'cli'])
+        assert (args.name, args.tag) == ('cli', ['cli'])
+        assert calls == ['cli', 'cli']
+
+    @pytest.mark.parametrize('env, argv, expected', [
+        pytest.param({}, ['--tag', 'b'], ['b'], id='append_cli'),
+        pytest.param({'TEST_TAG': 'a'}, [], ['a'], id='append_env'),
+        pytest.param({'TEST_TAG': 'a c'}, ['--tag', 'b'], ['b'], id='append_cli_over_env'),
+    ])
+    def test_append(self, env, argv, expected):
+        parser = ArgumentParser(env_prefix='TEST_')
+        parser.add_argument('--tag', action='append')
+        with patch.dict('os.environ', env):
+            assert parser.parse_args(argv).tag == expected
+
+    @pytest.mark.parametrize('env, argv, expected', [
+        pytest.param({}, ['-v'], 1, id='count_cli'),
+        pytest.param({'TEST_VERBOSE': '2'}, [], 2, id='count_env'),
+        pytest.param({'TEST_VERBOSE': '5'}, ['-vv'], 2, id='count_cli_over_env'),
+    ])
+    def test_count(self, env, argv, expected):
+        parser = ArgumentParser(env_prefix='TEST_')
+        parser.add_argument('-v', '--verbose', action='count')
+        with patch.dict('os.environ', env):
+            assert parser.parse_args(argv).verbose == expected
+
+    def test_convert_file_values(self, tmp_path):
+        path = tmp_path / 'config.json'
+        path.write_text(json.dumps({'lr': 1, 'ids': ['1', 2]}))
+        parser = ArgumentParser(default_files=[path])
+        parser.add_argument('--lr', type=float)
+        parser.add_argument('--ids', type=int, nargs='+')
+        args = parser.parse_args([])
+        assert args.lr == 1. and isinstance(args.lr, float)
+        assert args.ids == [1, 2]
+
+    @pytest.mark.parametrize('kwargs, env_value, file_value, expected', [
+        pytest.param({'action': 'extend', 'nargs': '+'}, 'a b', None, ['a', 'b'], id='extend'),
+        pytest.param({'action': 'append', 'nargs': 2}, 'a b', None, [['a', 'b']], id='append_2'),
+        pytest.param(
+            {'action': 'append', 'nargs': 2}, 'a b c d', None, [['a', 'b'], ['c', 'd']],
+            id='append_2_twice',
+        ),
+        pytest.param({'action': 'append', 'nargs': '+'}, 'a b', None, [['a', 'b']], id='append_+'),
+        pytest.param(
+            {'action': 'append', 'nargs': '*'}, None, [['a'], ['b', 'c']], [['a'], ['b', 'c']],
+            id='append_*_file',
+        ),
+    ])
+    def test_multiple_values(self, tmp_path, kwargs, env_value, file_value, expected):
+        path = tmp_path / 'config.json'
+        path.write_text(json.dumps({} if file_value is None else {'x': file_value}))
+        parser = ArgumentParser(default_files=[path], env_prefix='TEST_')
+        parser.add_argument('--x', **kwargs)
+        env = {} if env_value is None else {'TEST_X': env_value}
+        with patch.dict('os.environ', env):
+            assert parser.parse_args([]).x == expected
+
+    def test_nargs_env(self):
+        parser = ArgumentParser(env_prefix='TEST_')
+        parser.add_argument('--ids', type=int, nargs='*')
+        with patch.dict('os.environ', {'TEST_IDS': '1 2'}):
+            assert parser.parse_args([]).ids == [1, 2]
+
+    @pytest.mark.parametrize('env, file_content', [
+        pytest.param({'TEST_EPOCHS': 'seven'}, {}, id='invalid_type'),
+        pytest.param({}, {'n': 50}, id='file_value_out_of_range'),
+        pytest.param({'TEST_MODE': 'zzz'}, {}, id='env_value_not_in_choices'),
+        pytest.param({}, {'mode': 'zzz'}, id='file_value_not_in_choices'),
+        pytest.param({'TEST_VERBOSE': 'many'}, {}, id='invalid_count'),
+        pytest.param({'TEST_CACHE': 'maybe'}, {}, id='invalid_bool'),
+        pytest.param({'TEST_PAIR': 'a b c'}, {}, id='invalid_nargs_count'),
+        pytest.param({}, {'cache': 'maybe'}, id='invalid_file_bool'),
+    ])
+    def test_invalid_value(self, tmp_path, env, file_content):
+        path = tmp_path / 'config.json'
+        path.write_text(json.dumps(file_content))
+        parser = ArgumentParser(default_files=[path], env_prefix='TEST_')
+        parser.add_argument('--epochs', type=int)
+        parser.add_argument('--n', type=IntRange(0, 10))
+        parser.add_argument('--mode', choices=['a', 'b'])
+        parser.add_argument('-v', '--verbose', action='count')
+        parser.add_argument('--cache', action='store_false')
+        parser.add_argument('--pair', action='append', nargs=2)
+        with patch.dict('os.environ', env), pytest.raises(SystemExit):
+            parser.parse_args([])
+
+
+class TestReparse:
+
+    @pytest.fixture
+    def calls(self):
+        return []
+
+    @pytest.fixture
+    def parser(self, calls):
+
+        def type_(s):
+            calls.append(s)
+            return int(s)
+
+        def validate(s):
+            calls.append(s)
+            return s
+
+        parser = ArgumentParser()
+        parser.add_argument('x', type=type_)
+        parser.add_argument('--name', type=validate, default='abc')
+        parser.add_argument('--lr', type=float, default=1e-3)
+        parser.add_argument('--seed', type=type_, required=True)
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument('--foo', type=type_)
+        group.add_argument('--boo', type=type_)
+        return parser
+
+    def test_reparse(self, parser, calls):
+        base = parser.parse_args(['1', '--seed', '2', '--foo', '3'])
+        calls.clear()
+
+        args, changed = parser.reparse(base, ['--lr', '3e-4', '--foo', '4'])
+        assert changed == ['lr', 'foo']
+        assert (args.x, args.lr, args.seed, args.foo, args.boo) == (1, 3e-4, 2, 4, None)
+        assert type(args) is type(base)
+        assert calls == ['4']  # untouched values are not converted again, even string defaults
+        assert args.name == 'abc'
+        assert (base.lr, base.foo) == (1e-3, 3)  # base is untouched
+
+    def test_reparse_unchanged(self, parser):
+        base = parser.parse_args(['1', '--seed', '2'])
+        args, changed = parser.reparse(base, [])
+        assert vars(args) == vars(base)
+        assert changed == []
+
+    def test_reparse_accumulating(self):
+        parser = ArgumentParser()
+        parser.add_argument('--tag', action='append')
+        parser.add_argument('-v', '--verbose', action='count', default=0)
+        base = parser.parse_args(['--tag', 'a', '-v'])
+
+        args, changed = parser.reparse(base, ['--tag', 'b', '-vv'])
+        assert (args.tag, args.verbose) == (['a', 'b'], 3)
+        assert changed == ['tag', 'verbose']
+        assert (base.tag, base.verbose) == (['a'], 1)
+
+    def test_reparse_same_value(self, parser):
+        base = parser.parse_args(['1', '--seed', '2', '--foo', '3'])
+        args, changed = parser.reparse(base, ['--lr', '1e-3', '--seed', '2', '--foo', '5'])
+        assert changed == ['foo']
+        assert (args.lr, args.seed, args.foo) == (1e-3, 2, 5)
+
+    @pytest.mark.parametrize('parser_kwargs, base_argv', [
+        pytest.param({}, [], id='string_default'),
+        pytest.param({'default_dict': {'a': '1'}}, [], id='layered_default'),
+        pytest.param({}, ['--b', '2'], id='same_option'),
+    ])
+    def test_reparse_group_without_conflict(self, parser_kwargs, base_argv):
+        parser = ArgumentParser(**parser_kwargs)
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument('--a', type=int, default='0')
+        group.add_argument('--b', type=int)
+        base = parser.parse_args(base_argv)
+        args, changed = parser.reparse(base, ['--b', '1'])
+        assert args.b == 1
+        assert changed == ['b']
+
+    @pytest.mark.parametrize('delta_argv', [
+        pytest.param(['--boo', '4'], id='conflict_with_base'),
+        pytest.param(['--foo', '4', '--boo', '4'], id='conflict_in_delta'),
+        pytest.param(['5'], id='positional'),
+        pytest.param(['--lr', 'abc'], id='invalid'),
+        pytest.param(['--help'], id='help'),
+        pytest.param(['--version'], id='version'),
+    ])
+    def test_reparse_error(self, parser, delta_argv, capsys):
+        parser.add_argument('--version', action='version', version='1.0')
+        base = parser.parse_args(['1', '--seed', '2', '--foo', '3'])
+        with pytest.raises(SystemExit) as exc_info:
+            parser.reparse(base, delta_argv)
+        assert exc_info.value.code == 2
+        assert capsys.readouterr().out == ''
+
+    def test_reparse_plain_namespace(self):
+        parser = ArgumentParser()
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument('--a', type=int)
+        group.add_argument('--b', type=int)
+        group.add_argument('--c', type=int)
+
+        args, changed = parser.reparse(argparse.Namespace(a=None, b=1, c=None), ['--b', '2'])
+        assert (args.a, args.b, changed) == (None, 2, ['b'])
+        with pytest.raises(SystemExit):
+            parser.reparse(argparse.Namespace(a=1, b=None, c=None), ['--b', '2'])
+
+    def test_reparse_subparsers(self):
+        parser = ArgumentParser()
+        subparsers = parser.add_subparsers(dest='command')
+        subparsers.add_parser('train').add_argument('--k', type=int)
+        base = parser.parse_args(['train', '--k', '1'])
+        with pytest.raises(ValueError):
+            parser.reparse(base, ['--k', '2'])
@@ -0,0 +1,52 @@
+import json
+import os
+
+import pytest
+
+from ..sources import clear_cache, load_config_file
+
+
+@pytest.fixture(autouse=True)
+def cache():
+    yield
+    clear_cache()
+
+
+def test_load_json(tmp_path):
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps({'a': 1}))
+    assert load_config_file(path) == {'a': 1}
+
+
+def test_load_toml(tmp_path):
+    pytest.importorskip('tomllib')
+    path = tmp_path / 'config.toml'
+    path.write_text('a = 1\n[b]\nc = "d"\n')
+    assert load_config_file(path) == {'a': 1, 'b': {'c': 'd'}}
+
+
+def test_missing_file(tmp_path):
+    assert load_config_file(tmp_path / 'missing.json') == {}
+
+
+def test_cached_by_mtime(tmp_path):
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps({'a': 1}))
+    content = load_config_file(path)
+    assert load_config_file(path) is content
+
+    path.write_text(json.dumps({'a': 2}))
+    mtime = os.stat(path).st_mtime_ns
+    os.utime(path, ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+    assert load_config_file(path) == {'a': 2}
+
+
+@pytest.mark.parametrize('filename, content', [
+    ('config.yaml', 'a: 1'),
+    ('config.json', '[1, 2]'),
+])
+def test_raise(tmp_path, filename, content):
+    path = tmp_path / filename
+    path.write_text(content)
+    with pytest.raises(ValueError):
+        load_config_file(path)